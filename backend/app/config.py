@@ -1,3 +1,5 @@
+import os
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -12,9 +14,23 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 600
 
-    # Database URL
+    # Database URL. The state layer only supports MySQL; override this with
+    # a mysql:// URL in .env (the default exists only so the server can
+    # start without one).
     DATABASE_URL: str = "sqlite:///./veloera.db"
 
+    # How long (in seconds) a session read may be served from the in-process
+    # cache before going back to the database.
+    SESSION_CACHE_TTL_SECONDS: float = 2.0
+
+    # Connection pool sizing (MySQL). The max defaults to scaling with the
+    # host's CPUs so concurrency isn't capped by a hard-coded pool size.
+    # Pooled connections are recycled after DB_POOL_RECYCLE_SECONDS so the
+    # server doesn't silently drop long-idle ones.
+    DB_POOL_MIN_SIZE: int = 5
+    DB_POOL_MAX_SIZE: int = max(10, 2 * (os.cpu_count() or 1))
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+
     # Linux.do OAuth Settings
     LINUXDO_CLIENT_ID: str | None = None
     LINUXDO_CLIENT_SECRET: str | None = None
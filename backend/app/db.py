@@ -1,62 +1,103 @@
-import sqlite3
+import asyncio
 import logging
-import mysql.connector
+import asyncmy
+from contextlib import asynccontextmanager
 from urllib.parse import urlparse
-from mysql.connector import pooling
 from .config import settings
 
 logger = logging.getLogger(__name__)
 
+# --- Database URL (parsed once at import time) ---
+# get_db_connection sits on the hot path of every session read/write, so we
+# avoid re-parsing the URL on each call. Only MySQL is supported: the whole
+# query layer (placeholders, cursors, upsert syntax) is written against it.
+_parsed_url = urlparse(settings.DATABASE_URL)
+_SCHEME = _parsed_url.scheme
+
 # --- Global Connection Pool ---
 db_pool = None
+_pool_monitor_task = None
 
-def initialize_db_pool():
-    """Initializes the database connection pool based on the DATABASE_URL."""
-    global db_pool
+async def initialize_db_pool():
+    """Initializes the async database connection pool based on the DATABASE_URL."""
+    global db_pool, _pool_monitor_task
+    if _SCHEME != "mysql":
+        logger.error(
+            f"Unsupported database scheme '{_SCHEME}': only MySQL is supported. "
+            "Set DATABASE_URL to a mysql:// URL."
+        )
+        return
     try:
-        db_url = settings.DATABASE_URL
-        parsed_url = urlparse(db_url)
-
-        if parsed_url.scheme == "mysql":
-            pool_config = {
-                "host": parsed_url.hostname,
-                "port": parsed_url.port,
-                "user": parsed_url.username,
-                "password": parsed_url.password,
-                "database": parsed_url.path.lstrip('/'),
-                "pool_name": "game_pool",
-                "pool_size": 5, # Start with a pool of 5 connections
-            }
-            db_pool = pooling.MySQLConnectionPool(**pool_config)
-            logger.info(f"MySQL connection pool '{db_pool.pool_name}' initialized.")
-        # SQLite does not require a traditional pool in the same way for this app's structure
-    except mysql.connector.Error as e:
+        db_pool = await asyncmy.create_pool(
+            host=_parsed_url.hostname,
+            port=_parsed_url.port,
+            user=_parsed_url.username,
+            password=_parsed_url.password,
+            db=_parsed_url.path.lstrip('/'),
+            minsize=settings.DB_POOL_MIN_SIZE,
+            maxsize=settings.DB_POOL_MAX_SIZE,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+            # Without autocommit even a plain SELECT leaves the connection
+            # in an implicit transaction, and asyncmy's pool closes
+            # in-transaction connections on release instead of reusing them.
+            autocommit=True,
+        )
+        _pool_monitor_task = asyncio.create_task(_log_pool_utilization())
+        logger.info(
+            f"MySQL connection pool initialized (asyncmy, "
+            f"min={settings.DB_POOL_MIN_SIZE}, max={settings.DB_POOL_MAX_SIZE})."
+        )
+    except Exception as e:
         logger.error(f"Failed to initialize MySQL connection pool: {e}", exc_info=True)
         db_pool = None
 
-def get_db_connection():
-    """Gets a connection from the pool or creates a new one for SQLite."""
+async def _log_pool_utilization(interval: float = 60.0):
+    """Periodically logs how many pooled connections are in use."""
+    while True:
+        await asyncio.sleep(interval)
+        if db_pool is not None:
+            in_use = db_pool.size - db_pool.freesize
+            logger.info(
+                f"DB pool utilization: {in_use}/{db_pool.size} in use "
+                f"(maxsize={db_pool.maxsize})."
+            )
+
+async def close_db_pool():
+    """Closes the pool and waits for in-flight connections to be released."""
+    global db_pool, _pool_monitor_task
+    if _pool_monitor_task is not None:
+        _pool_monitor_task.cancel()
+        _pool_monitor_task = None
+    if db_pool is not None:
+        db_pool.close()
+        await db_pool.wait_closed()
+        db_pool = None
+
+async def get_db_connection():
+    """Acquires a connection from the pool."""
+    if db_pool is None:
+        logger.error("MySQL pool is not initialized. Cannot get connection.")
+        return None
     try:
-        db_url = settings.DATABASE_URL
-        parsed_url = urlparse(db_url)
-
-        if parsed_url.scheme == "sqlite":
-            db_path = settings.DATABASE_URL.replace("sqlite:///", "")
-            conn = sqlite3.connect(db_path)
-            conn.row_factory = sqlite3.Row
-            return conn # SQLite connections are lightweight, direct creation is fine
-        
-        elif parsed_url.scheme == "mysql":
-            if db_pool is None:
-                logger.error("MySQL pool is not initialized. Cannot get connection.")
-                return None
-            # This gets a connection from the already created pool
-            return db_pool.get_connection()
-            
-        else:
-            logger.error(f"Unsupported database scheme: {parsed_url.scheme}")
-            return None
-            
-    except (sqlite3.Error, mysql.connector.Error) as e:
+        return await db_pool.acquire()
+    except Exception as e:
         logger.error(f"Database connection failed: {e}", exc_info=True)
-        return None
\ No newline at end of file
+        return None
+
+async def release_db_connection(conn):
+    """Returns a connection to the pool."""
+    if conn is not None and db_pool is not None:
+        db_pool.release(conn)
+
+@asynccontextmanager
+async def acquire():
+    """Yields a connection and guarantees it is released afterwards.
+
+    Yields None when no connection could be obtained, so callers can bail
+    out without their own try/finally cleanup.
+    """
+    conn = await get_db_connection()
+    try:
+        yield conn
+    finally:
+        await release_db_connection(conn)
@@ -2,8 +2,8 @@ import logging
 import math
 import random
 import json
+import orjson
 import asyncio
-import time
 import traceback
 from copy import deepcopy
 from datetime import date
@@ -136,7 +136,7 @@ async def _handle_roll_request(
     )
     await asyncio.sleep(0.03)  # Give time for async websocket delivery
 
-    prompt_for_ai_part2 = f"{result_text}\n\n请严格基于此判定结果，继续叙事，并返回包含叙事和状态更新的最终JSON对象。这是当前的游戏状态JSON:\n{json.dumps(last_state, ensure_ascii=False)}"
+    prompt_for_ai_part2 = f"{result_text}\n\n请严格基于此判定结果，继续叙事，并返回包含叙事和状态更新的最终JSON对象。这是当前的游戏状态JSON:\n{orjson.dumps(last_state).decode()}"
     history_for_part2 = internal_history  # History is now updated before this call
     ai_response = await openai_client.get_ai_response(
         prompt=prompt_for_ai_part2, history=history_for_part2
@@ -144,7 +144,7 @@ async def _handle_roll_request(
     return ai_response, roll_event
 
 
-def end_game_and_get_code(
+async def end_game_and_get_code(
     user_id: int, player_id: str, spirit_stones: int
 ) -> tuple[dict, dict]:
     if spirit_stones <= 0:
@@ -157,7 +157,7 @@ def end_game_and_get_code(
 
     # Use the new database-integrated redemption code generation
     code_name = f"天道十试-{date.today().isoformat()}-{player_id}"
-    redemption_code = redemption.generate_and_insert_redemption_code(
+    redemption_code = await redemption.generate_and_insert_redemption_code(
         user_id=user_id, quota=converted_value, name=code_name
     )
 
@@ -248,7 +248,7 @@ async def _process_player_action_async(user_info: dict, action: str):
                 opportunities_remaining_minus_1=session["opportunities_remaining"] - 1,
             )
             if is_starting_trial
-            else f'这是当前的游戏状态JSON:\n{json.dumps(session_copy, ensure_ascii=False)}\n\n玩家的行动是: "{action}"\n\n请根据状态和行动，生成包含`narrative`和(`state_update`或`roll_request`)的JSON作为回应。如果角色死亡，请在叙述中说明，并在`state_update`中同时将`is_in_trial`设为`false`，`current_life`设为`null`。'
+            else f'这是当前的游戏状态JSON:\n{orjson.dumps(session_copy).decode()}\n\n玩家的行动是: "{action}"\n\n请根据状态和行动，生成包含`narrative`和(`state_update`或`roll_request`)的JSON作为回应。如果角色死亡，请在叙述中说明，并在`state_update`中同时将`is_in_trial`设为`false`，`current_life`设为`null`。'
         )
 
         # Update histories with user action first
@@ -266,7 +266,7 @@ async def _process_player_action_async(user_info: dict, action: str):
         json_str = _extract_json_from_response(ai_json_response_str)
         if not json_str:
             raise json.JSONDecodeError("No JSON found", ai_json_response_str, 0)
-        ai_response_data = json.loads(json_str)
+        ai_response_data = orjson.loads(json_str)
 
         # Handle Roll vs No-Roll Path
         if "roll_request" in ai_response_data and ai_response_data["roll_request"]:
@@ -277,7 +277,7 @@ async def _process_player_action_async(user_info: dict, action: str):
             session["internal_history"].append(
                 {
                     "role": "assistant",
-                    "content": json.dumps(ai_response_data, ensure_ascii=False),
+                    "content": orjson.dumps(ai_response_data).decode(),
                 }
             )
 
@@ -299,7 +299,7 @@ async def _process_player_action_async(user_info: dict, action: str):
                 raise json.JSONDecodeError(
                     "No JSON in second-stage", final_ai_json_str, 0
                 )
-            final_response_data = json.loads(final_json_str)
+            final_response_data = orjson.loads(final_json_str)
 
             # 4. Process final response
             narrative = final_response_data.get("narrative", "AI响应格式错误，请重试")
@@ -350,7 +350,7 @@ async def _process_player_action_async(user_info: dict, action: str):
             if "正常" == await cheat_check.run_cheat_check(player_id, inputs_to_check):
                 session = await state_manager.get_session(player_id)
                 spirit_stones = trigger.get("spirit_stones", 0)
-                end_game_data, end_day_update = end_game_and_get_code(
+                end_game_data, end_day_update = await end_game_and_get_code(
                     user_id, player_id, spirit_stones
                 )
                 session = _apply_state_update(session, end_day_update)
@@ -432,7 +432,6 @@ async def _process_player_action_async(user_info: dict, action: str):
 
         session["roll_event"] = None
         session["is_processing"] = False
-        session["last_modified"] = time.time()
         await state_manager.save_session(player_id, session)
         logger.info(f"Async action task for {player_id} finished.")
 
@@ -1,17 +1,28 @@
+import asyncio
 import logging
 from collections import defaultdict
 from .websocket_manager import manager as websocket_manager
 
 logger = logging.getLogger(__name__)
 
+def _report_flush_task_death(task: asyncio.Task):
+    """Makes an unexpected flush-task exit visible instead of silent."""
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Live System: flush task died: {task.exception()!r}")
+
 class LiveManager:
-    def __init__(self):
+    def __init__(self, flush_interval: float = 0.05):
         # Key: a player_id being watched (the "broadcaster")
         # Value: a set of player_ids who are watching (the "viewers")
         self.viewers = defaultdict(set)
         # Key: a viewer's player_id
         # Value: the player_id they are currently watching
         self.watching = {}
+        # Latest queued state per broadcaster; the flush loop coalesces
+        # rapid-fire saves into one broadcast per player per interval.
+        self.pending_broadcasts: dict[str, dict] = {}
+        self._flush_interval = flush_interval
+        self._flush_task: asyncio.Task | None = None
 
     def add_viewer(self, viewer_id: str, target_id: str):
         """Adds a viewer to a target's broadcast."""
@@ -34,6 +45,46 @@ class LiveManager:
                     del self.viewers[target_id]
             logger.info(f"Live System: Player '{viewer_id}' stopped watching '{target_id}'.")
 
+    def queue_state_update(self, target_id: str, state: dict):
+        """Records the latest state for a target; only the newest queued state
+        is broadcast when the flush loop next ticks."""
+        if target_id in self.viewers:
+            self.pending_broadcasts[target_id] = state
+
+    async def start(self):
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+            self._flush_task.add_done_callback(_report_flush_task_death)
+            logger.info("Live System: broadcast flush loop started.")
+
+    async def stop(self):
+        """Stops the flush loop and sends out any still-queued updates."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self._flush()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            try:
+                await self._flush()
+            except Exception as e:
+                # One failed broadcast must not kill live updates for everyone.
+                logger.error(f"Live System: broadcast flush failed: {e}", exc_info=True)
+
+    async def _flush(self):
+        if not self.pending_broadcasts:
+            return
+        batch = self.pending_broadcasts
+        self.pending_broadcasts = {}
+        for target_id, state in batch.items():
+            await self.broadcast_state_update(target_id, state)
+
     async def broadcast_state_update(self, target_id: str, state: dict):
         """Broadcasts a state update to all viewers of a target player."""
         if target_id in self.viewers:
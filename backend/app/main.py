@@ -30,10 +30,14 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logging.info("Application startup...")
-    db.initialize_db_pool() # Initialize the database connection pool
+    await db.initialize_db_pool() # Initialize the database connection pool
+    await state_manager.session_writer.start()
+    await live_manager.start()
     yield
     logging.info("Application shutdown...")
-    # The pool will be implicitly closed when the application exits.
+    await live_manager.stop()
+    await state_manager.session_writer.stop() # Drain pending writes first
+    await db.close_db_pool()
 
 # --- FastAPI App Instance ---
 app = FastAPI(lifespan=lifespan, title="浮生十梦")
@@ -136,7 +140,7 @@ async def logout():
 @api_router.get("/live/players")
 async def get_live_players():
     """Returns a list of the most recently active players for the live view."""
-    return state_manager.get_most_recent_sessions(limit=10)
+    return await state_manager.get_most_recent_sessions(limit=10)
 
 @api_router.post("/game/init")
 async def init_game(
@@ -4,7 +4,7 @@ from openai import AsyncOpenAI, APIError
 from .config import settings
 import asyncio
 import random
-import json
+import orjson
 
 # --- Logging ---
 logger = logging.getLogger(__name__)
@@ -105,7 +105,7 @@ async def get_ai_response(
 
             if force_json:
                 try:
-                    json_part = json.loads(_extract_json_from_response(ret))
+                    json_part = orjson.loads(_extract_json_from_response(ret))
                     if json_part:
                         return ret
                     else:
@@ -1,4 +1,5 @@
 from cryptography.fernet import Fernet, InvalidToken
+from functools import lru_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -9,8 +10,15 @@ logger = logging.getLogger(__name__)
 _key = Fernet.generate_key()
 _cipher_suite = Fernet(_key)
 
+@lru_cache(maxsize=4096)
 def encrypt_player_id(player_id: str) -> str:
-    """Encrypts a player ID into a URL-safe string."""
+    """Encrypts a player ID into a URL-safe string.
+
+    Fernet normally randomizes each token, so caching makes the result
+    deterministic per process. That is fine here: the key is regenerated on
+    every restart and the token is only an opaque handle for the live view,
+    while the AES work would otherwise dominate the recent-players response.
+    """
     try:
         encoded_id = player_id.encode('utf-8')
         encrypted_id = _cipher_suite.encrypt(encoded_id)
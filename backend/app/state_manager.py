@@ -1,143 +1,363 @@
 import asyncio
-import json
 import logging
 import time
+import msgspec
+import orjson
+import zstandard as zstd
+from collections import defaultdict
+from asyncmy.cursors import DictCursor
 from .websocket_manager import manager as websocket_manager
 from .live_system import live_manager
+from .config import settings
 from . import security
 from . import db
 
 # --- Logging ---
 logger = logging.getLogger(__name__)
 
+# --- In-Process Session Cache ---
+# Repeat reads within the TTL window are served from memory instead of
+# opening a connection and deserializing the blob again. save_session always
+# refreshes the entry, so readers in this process see the latest state.
+# Note: with multiple worker processes, staleness is bounded by the TTL.
+#
+# The cache is bounded: once it holds _SESSION_CACHE_MAX_ENTRIES players,
+# inserting a new one first sweeps out expired entries (and their locks),
+# then falls back to dropping the oldest — session dicts carry the full
+# internal_history, so letting every player ever seen accumulate would grow
+# memory without limit.
+_SESSION_CACHE_MAX_ENTRIES = 4096
+
+_session_cache: dict[str, tuple[float, dict]] = {}
+_session_locks: defaultdict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+def _get_cached_session(player_id: str) -> dict | None:
+    cached = _session_cache.get(player_id)
+    if cached and time.monotonic() - cached[0] < settings.SESSION_CACHE_TTL_SECONDS:
+        return cached[1]
+    return None
+
+def _cache_session(player_id: str, session_data: dict):
+    if player_id not in _session_cache and len(_session_cache) >= _SESSION_CACHE_MAX_ENTRIES:
+        _evict_cached_sessions()
+    _session_cache[player_id] = (time.monotonic(), session_data)
+
+def _drop_cached_session(player_id: str):
+    _session_cache.pop(player_id, None)
+    lock = _session_locks.get(player_id)
+    if lock is not None and not lock.locked():
+        del _session_locks[player_id]
+
+def _evict_cached_sessions():
+    """Drops expired entries; if none have expired, drops the oldest ones."""
+    now = time.monotonic()
+    ttl = settings.SESSION_CACHE_TTL_SECONDS
+    expired = [
+        player_id
+        for player_id, (cached_at, _) in _session_cache.items()
+        if now - cached_at >= ttl
+    ]
+    for player_id in expired:
+        _drop_cached_session(player_id)
+
+    if len(_session_cache) >= _SESSION_CACHE_MAX_ENTRIES:
+        oldest = sorted(_session_cache, key=lambda pid: _session_cache[pid][0])
+        for player_id in oldest[: _SESSION_CACHE_MAX_ENTRIES // 4]:
+            _drop_cached_session(player_id)
+
+# --- Session Serialization ---
+# Sessions are stored as zstd-compressed msgpack blobs: msgpack is much
+# faster to (de)serialize than JSON text, and the history-heavy session
+# dicts are redundant enough that compression cuts most of the bytes
+# shipped to and from MySQL.
+_msgpack_encoder = msgspec.msgpack.Encoder()
+_msgpack_decoder = msgspec.msgpack.Decoder()
+_zstd_compressor = zstd.ZstdCompressor(level=3)
+_zstd_decompressor = zstd.ZstdDecompressor()
+
+# Single-byte format marker prefixed to new blobs. msgpack maps start at
+# 0x80 and JSON text starts with '{', so 0x01 cannot be confused with
+# either of the older on-disk formats.
+_FORMAT_ZSTD_MSGPACK = b"\x01"
+
+def _encode_session(session_data: dict) -> bytes:
+    """Serializes a session dict into the blob stored in the DB."""
+    return _FORMAT_ZSTD_MSGPACK + _zstd_compressor.compress(
+        _msgpack_encoder.encode(session_data)
+    )
+
+def _decode_session(raw) -> dict:
+    """Deserializes a stored session, accepting older formats on read."""
+    if isinstance(raw, str):
+        # Legacy row written while session_data was still a TEXT column.
+        return orjson.loads(raw)
+    if raw[:1] == _FORMAT_ZSTD_MSGPACK:
+        return _msgpack_decoder.decode(_zstd_decompressor.decompress(raw[1:]))
+    if raw[:1] == b"{":
+        # Legacy JSON that was read back as bytes after the BLOB migration.
+        return orjson.loads(raw)
+    # Legacy uncompressed msgpack.
+    return _msgpack_decoder.decode(raw)
+
+# --- Hot-Path Queries ---
+# Kept as module constants so the interned strings are reused on every call.
+# The query layer is MySQL-only (see db.py).
+_Q_GET_SESSION = "SELECT session_data FROM game_sessions WHERE player_id = %s"
+_Q_UPSERT_SESSION = """
+INSERT INTO game_sessions (player_id, session_data, recent_inputs)
+VALUES (%s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    session_data = VALUES(session_data),
+    recent_inputs = VALUES(recent_inputs);
+"""
+_Q_RECENT_SESSIONS = "SELECT player_id, UNIX_TIMESTAMP(last_modified) AS lm FROM game_sessions ORDER BY last_modified DESC LIMIT %s"
+_Q_INSERT_IGNORE_SESSION = "INSERT IGNORE INTO game_sessions (player_id, session_data) VALUES (%s, %s)"
+_Q_GET_RECENT_INPUTS = "SELECT recent_inputs FROM game_sessions WHERE player_id = %s"
+
+# How many of the latest player inputs are denormalized into the small
+# recent_inputs column on every save. The cheat checker asks for roughly
+# 8 + unchecked_rounds_count, so 64 leaves ample headroom.
+_RECENT_INPUTS_LIMIT = 64
+
+def _recent_user_inputs(session_data: dict) -> list[str]:
+    """Extracts the latest user inputs from a session's history tail."""
+    history = session_data.get("internal_history", [])
+    # Only the tail can contribute, so don't walk a 10k-message history.
+    tail = history[-(_RECENT_INPUTS_LIMIT * 4):]
+    return [item["content"] for item in tail if item.get("role") == "user"][-_RECENT_INPUTS_LIMIT:]
+
+# --- Batched Session Writer ---
+
+class _SessionWriter:
+    """Coalesces session upserts and flushes them in periodic batches.
+
+    Several save_session calls for the same player inside one flush window
+    collapse into a single row, and all pending rows go to the database in
+    one multi-row upsert instead of one round-trip per save. Readers are
+    unaffected because the in-process cache is updated synchronously before
+    a write is enqueued.
+    """
+
+    def __init__(self, flush_interval: float = 0.02):
+        self._flush_interval = flush_interval
+        self._pending: dict[str, tuple[bytes, bytes]] = {}
+        self._task: asyncio.Task | None = None
+
+    def enqueue(self, player_id: str, session_blob: bytes, recent_inputs: bytes):
+        """Records the latest row values for a player; overwrites queued ones."""
+        self._pending[player_id] = (session_blob, recent_inputs)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+            self._task.add_done_callback(self._report_task_death)
+            logger.info("Session writer started.")
+
+    @staticmethod
+    def _report_task_death(task: asyncio.Task):
+        """Logs if the flush loop ever exits with an unhandled exception."""
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Session writer flush task died: {task.exception()!r}")
+
+    async def stop(self):
+        """Stops the flush loop and drains any writes still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._flush()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            await self._flush()
+
+    async def _flush(self):
+        if not self._pending:
+            return
+        batch = self._pending
+        self._pending = {}
+
+        async with db.acquire() as conn:
+            if not conn:
+                logger.error(f"Dropped {len(batch)} session write(s): no DB connection.")
+                return
+            try:
+                rows = [
+                    (player_id, blob, recent_inputs)
+                    for player_id, (blob, recent_inputs) in batch.items()
+                ]
+                async with conn.cursor() as cursor:
+                    await cursor.executemany(_Q_UPSERT_SESSION, rows)
+                await conn.commit()
+            except Exception as e:
+                logger.error(f"Failed to flush {len(batch)} session write(s): {e}")
+
+
+session_writer = _SessionWriter()
+
 # --- Database Interaction Functions ---
 
 async def get_session(player_id: str) -> dict | None:
-    """Gets the session object from the database."""
-    conn = db.get_db_connection()
-    if not conn:
-        return None
-    
-    try:
-        # For MySQL, we want dictionary cursors. For SQLite, row_factory is set in db.py
-        is_mysql = 'mysql' in str(type(conn)).lower()
-        cursor = conn.cursor(dictionary=True) if is_mysql else conn.cursor()
-
-        # MySQL uses %s, SQLite uses ?. We assume MySQL for now as per the .env file.
-        cursor.execute("SELECT session_data FROM game_sessions WHERE player_id = %s", (player_id,))
-        row = cursor.fetchone()
-        
-        if row:
-            session_data = row['session_data'] # type: ignore
-            if session_data:
-                return json.loads(session_data)
-        return None
-    except Exception as e:
-        logger.error(f"Failed to get session for player {player_id}: {e}")
-        return None
-    finally:
-        if conn and hasattr(conn, 'is_connected') and conn.is_connected():
-            cursor.close()
-            conn.close()
-        elif conn: # For sqlite3
-             conn.close()
+    """Gets the session object from the cache, falling back to the database."""
+    cached = _get_cached_session(player_id)
+    if cached is not None:
+        return cached
+
+    async with _session_locks[player_id]:
+        # Another coroutine may have filled the cache while we waited.
+        cached = _get_cached_session(player_id)
+        if cached is not None:
+            return cached
+        session = await _fetch_session_from_db(player_id)
+        if session is not None:
+            _cache_session(player_id, session)
+        return session
+
+
+async def _fetch_session_from_db(player_id: str) -> dict | None:
+    """Reads and deserializes a session row straight from the database."""
+    async with db.acquire() as conn:
+        if not conn:
+            return None
+        try:
+            async with conn.cursor(cursor=DictCursor) as cursor:
+                await cursor.execute(_Q_GET_SESSION, (player_id,))
+                row = await cursor.fetchone()
+
+            if row:
+                session_data = row['session_data'] # type: ignore
+                if session_data:
+                    return _decode_session(session_data)
+            return None
+        except Exception as e:
+            logger.error(f"Failed to get session for player {player_id}: {e}")
+            return None
 
 
 async def save_session(player_id: str, session_data: dict):
     """
     Saves the entire session data for a player to the database and pushes it to their WebSocket.
     """
-    conn = db.get_db_connection()
-    if not conn:
-        return
+    # The last_modified column keeps itself current via ON UPDATE
+    # CURRENT_TIMESTAMP, so the session dict no longer carries a copy.
+    _cache_session(player_id, session_data)
+    session_blob = _encode_session(session_data)
 
-    try:
-        session_data["last_modified"] = time.time()
-        session_str = json.dumps(session_data, ensure_ascii=False)
-        cursor = conn.cursor()
-
-        # Use MySQL's INSERT ... ON DUPLICATE KEY UPDATE for efficiency
-        query = """
-        INSERT INTO game_sessions (player_id, session_data)
-        VALUES (%s, %s)
-        ON DUPLICATE KEY UPDATE session_data = VALUES(session_data);
-        """
-        cursor.execute(query, (player_id, session_str))
-        conn.commit()
-
-        tasks = [
-            websocket_manager.send_json_to_player(
-                player_id, {"type": "full_state", "data": session_data}
-            ),
-            live_manager.broadcast_state_update(player_id, session_data)
-        ]
-        asyncio.gather(*tasks)
-
-    except Exception as e:
-        logger.error(f"Failed to save session for player {player_id}: {e}")
-    finally:
-        if conn and hasattr(conn, 'is_connected') and conn.is_connected():
-            cursor.close()
-            conn.close()
-        elif conn:
-             conn.close()
+    # The upsert is coalesced by the session writer and the live broadcast
+    # by the live manager's flush loop; only the player's own full-state
+    # push happens inline, fed from the already-updated cache state.
+    # orjson already emits UTF-8 bytes; passing them straight to the driver
+    # avoids decoding to str only for the wire protocol to re-encode them.
+    recent_inputs = orjson.dumps(_recent_user_inputs(session_data))
+    session_writer.enqueue(player_id, session_blob, recent_inputs)
+    live_manager.queue_state_update(player_id, session_data)
+
+    await websocket_manager.send_json_to_player(
+        player_id, {"type": "full_state", "data": session_data}
+    )
 
 async def create_or_get_session(player_id: str) -> dict:
     """
     Retrieves a session from the DB. If it doesn't exist, creates an empty one.
+
+    The INSERT IGNORE and the SELECT share one connection, so a first load
+    costs a single round-trip batch instead of a SELECT miss followed by a
+    full save_session. Creating an empty session changes nothing visible,
+    so no broadcast is sent.
     """
-    session = await get_session(player_id)
-    if session is None:
-        session = {}
-        await save_session(player_id, session)
-    return session
+    cached = _get_cached_session(player_id)
+    if cached is not None:
+        return cached
+
+    async with db.acquire() as conn:
+        if not conn:
+            return {}
+        try:
+            async with conn.cursor(cursor=DictCursor) as cursor:
+                await cursor.execute(
+                    _Q_INSERT_IGNORE_SESSION, (player_id, _encode_session({}))
+                )
+                await cursor.execute(_Q_GET_SESSION, (player_id,))
+                row = await cursor.fetchone()
+            await conn.commit()
+
+            session = {}
+            if row and row['session_data']: # type: ignore
+                session = _decode_session(row['session_data']) # type: ignore
+            _cache_session(player_id, session)
+            return session
+        except Exception as e:
+            logger.error(f"Failed to create or get session for player {player_id}: {e}")
+            return {}
 
 async def get_last_n_inputs(player_id: str, n: int) -> list[str]:
     """Get the last N player inputs for a session."""
+    if n > _RECENT_INPUTS_LIMIT:
+        # More than the denormalized column retains; take the full-history path.
+        return await _get_last_n_inputs_from_history(player_id, n)
+
+    cached = _get_cached_session(player_id)
+    if cached is not None:
+        return _recent_user_inputs(cached)[-n:]
+
+    async with db.acquire() as conn:
+        if not conn: return []
+        try:
+            async with conn.cursor(cursor=DictCursor) as cursor:
+                await cursor.execute(_Q_GET_RECENT_INPUTS, (player_id,))
+                row = await cursor.fetchone()
+        except Exception as e:
+            logger.error(f"Failed to get recent inputs for player {player_id}: {e}")
+            return []
+
+    if not row:
+        return []
+    if row['recent_inputs']: # type: ignore
+        return orjson.loads(row['recent_inputs'])[-n:] # type: ignore
+    # Row predates the recent_inputs column being populated.
+    return await _get_last_n_inputs_from_history(player_id, n)
+
+
+async def _get_last_n_inputs_from_history(player_id: str, n: int) -> list[str]:
+    """Slow path: derives the last N inputs from the full session history."""
     session = await get_session(player_id)
     if not session: return []
     history = session.get("internal_history", [])
     return [item["content"] for item in history if item.get("role") == "user"][-n:]
 
-def get_most_recent_sessions(limit: int = 10) -> list[dict]:
+async def get_most_recent_sessions(limit: int = 10) -> list[dict]:
     """Gets the most recently active sessions from the database."""
-    conn = db.get_db_connection()
-    if not conn: return []
-
-    try:
-        is_mysql = 'mysql' in str(type(conn)).lower()
-        cursor = conn.cursor(dictionary=True) if is_mysql else conn.cursor()
-        
-        query = "SELECT player_id, session_data FROM game_sessions ORDER BY last_modified DESC LIMIT %s"
-        cursor.execute(query, (limit,))
-        rows = cursor.fetchall()
-
-        results = []
-        for row in rows:
-            player_id = str(row['player_id']) # type: ignore
-            session_data = json.loads(str(row['session_data'])) # type: ignore
-            
-            encrypted_id = security.encrypt_player_id(player_id)
-            display_name = f"{player_id[0]}...{player_id[-1]}" if len(player_id) > 2 else player_id
-            
-            results.append({
-                "player_id": encrypted_id,
-                "display_name": display_name,
-                "last_modified": session_data.get("last_modified", 0)
-            })
-        return results
-    except Exception as e:
-        logger.error(f"Failed to get most recent sessions: {e}")
-        return []
-    finally:
-        if conn and hasattr(conn, 'is_connected') and conn.is_connected():
-            cursor.close()
-            conn.close()
-        elif conn:
-             conn.close()
+    async with db.acquire() as conn:
+        if not conn: return []
+        try:
+            # Only the id and timestamp are needed; fetching session_data
+            # would ship and deserialize every blob just to throw it away.
+            async with conn.cursor(cursor=DictCursor) as cursor:
+                await cursor.execute(_Q_RECENT_SESSIONS, (limit,))
+                rows = await cursor.fetchall()
+
+            encrypt = security.encrypt_player_id
+            results = []
+            for row in rows:
+                player_id = str(row['player_id']) # type: ignore
+
+                results.append({
+                    "player_id": encrypt(player_id),
+                    "display_name": f"{player_id[0]}...{player_id[-1]}" if len(player_id) > 2 else player_id,
+                    "last_modified": row['lm'] or 0 # type: ignore
+                })
+            return results
+        except Exception as e:
+            logger.error(f"Failed to get most recent sessions: {e}")
+            return []
 
 async def clear_session(player_id: str):
     """Clears a player's session."""
+    _drop_cached_session(player_id)
     await save_session(player_id, {})
     logger.info(f"Session for player {player_id} has been cleared.")
 
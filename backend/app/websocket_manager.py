@@ -1,7 +1,7 @@
 import logging
 import copy
 import gzip
-import json
+import orjson
 from fastapi import WebSocket, WebSocketDisconnect
 
 logger = logging.getLogger(__name__)
@@ -72,13 +72,11 @@ class ConnectionManager:
                 payload_to_send["data"].pop("internal_history", None)
         
         try:
-            # 1. Serialize dict to JSON string
-            json_str = json.dumps(payload_to_send)
-            # 2. Encode string to bytes
-            json_bytes = json_str.encode('utf-8')
-            # 3. Compress bytes using gzip
+            # 1. Serialize dict straight to UTF-8 bytes (orjson skips the str round-trip)
+            json_bytes = orjson.dumps(payload_to_send)
+            # 2. Compress bytes using gzip
             compressed_data = gzip.compress(json_bytes)
-            # 4. Send compressed bytes
+            # 3. Send compressed bytes
             await websocket.send_bytes(compressed_data)
         except (WebSocketDisconnect, RuntimeError) as e:
             logger.warning(f"WebSocket for player '{player_id}' disconnected before message could be sent: {e}")
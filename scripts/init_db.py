@@ -1,6 +1,7 @@
 import os
 import logging
 import mysql.connector
+from mysql.connector import errorcode
 from urllib.parse import urlparse
 import time
 
@@ -53,34 +54,79 @@ def initialize_database():
 
         if conn and conn.is_connected():
             cursor = conn.cursor()
-            
-            create_table_query = """
-            CREATE TABLE IF NOT EXISTS game_sessions (
-                player_id VARCHAR(255) PRIMARY KEY,
-                session_data TEXT,
-                last_modified TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-            );
-            """
-            
-            logger.info("Executing CREATE TABLE statement for game_sessions...")
-            cursor.execute(create_table_query)
+
+            # Idempotent DDL, one statement per table; future tables just
+            # join the list. (MySQL DDL auto-commits statement by statement;
+            # the final commit just flushes anything the driver has open.)
+            ddl_statements = [
+                """
+                CREATE TABLE IF NOT EXISTS game_sessions (
+                    player_id VARCHAR(255) PRIMARY KEY,
+                    session_data MEDIUMBLOB,
+                    recent_inputs TEXT,
+                    last_modified TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+                )
+                """,
+                """
+                CREATE TABLE IF NOT EXISTS redemptions (
+                    `key` VARCHAR(255) PRIMARY KEY,
+                    user_id VARCHAR(255),
+                    status INT,
+                    name VARCHAR(255),
+                    quota INT,
+                    created_time INT
+                )
+                """,
+            ]
+            logger.info(f"Executing {len(ddl_statements)} DDL statements...")
+            for ddl in ddl_statements:
+                cursor.execute(ddl)
             conn.commit()
-            logger.info("Table 'game_sessions' created or already exists.")
+            logger.info("Tables created or already exist.")
 
-            create_redemptions_table_query = """
-            CREATE TABLE IF NOT EXISTS redemptions (
-                `key` VARCHAR(255) PRIMARY KEY,
-                user_id VARCHAR(255),
-                status INT,
-                name VARCHAR(255),
-                quota INT,
-                created_time INT
-            );
-            """
-            logger.info("Executing CREATE TABLE statement for redemptions...")
-            cursor.execute(create_redemptions_table_query)
+            # Upgrade steps for schema bits that lack IF NOT EXISTS support
+            # run individually so their 'already there' errors can be
+            # tolerated without masking real failures.
+
+            # Existing installs created session_data as TEXT; the app now
+            # writes binary msgpack/zstd blobs, which a strict-mode TEXT
+            # column rejects. MODIFY is idempotent, so no guard is needed.
+            modify_column_query = "ALTER TABLE game_sessions MODIFY session_data MEDIUMBLOB;"
+            logger.info("Ensuring game_sessions.session_data is MEDIUMBLOB...")
+            cursor.execute(modify_column_query)
             conn.commit()
-            logger.info("Table 'redemptions' created or already exists.")
+            logger.info("Column 'session_data' is MEDIUMBLOB.")
+
+            # Existing installs created the table without recent_inputs (the
+            # small denormalized column get_last_n_inputs reads).
+            add_column_query = "ALTER TABLE game_sessions ADD COLUMN recent_inputs TEXT;"
+            logger.info("Ensuring column game_sessions.recent_inputs...")
+            try:
+                cursor.execute(add_column_query)
+                conn.commit()
+                logger.info("Column 'recent_inputs' added.")
+            except mysql.connector.Error as e:
+                if e.errno != errorcode.ER_DUP_FIELDNAME:
+                    raise
+                logger.info("Column 'recent_inputs' already exists.")
+
+            # get_most_recent_sessions orders by last_modified with a LIMIT;
+            # without this index MySQL full-scans and filesorts the table.
+            create_index_query = """
+            CREATE INDEX idx_sessions_last_modified
+            ON game_sessions (last_modified DESC);
+            """
+            logger.info("Ensuring index on game_sessions.last_modified...")
+            try:
+                cursor.execute(create_index_query)
+                conn.commit()
+                logger.info("Index 'idx_sessions_last_modified' created.")
+            except mysql.connector.Error as e:
+                # MySQL has no CREATE INDEX IF NOT EXISTS; a duplicate key
+                # name just means a previous run already created it.
+                if e.errno != errorcode.ER_DUP_KEYNAME:
+                    raise
+                logger.info("Index 'idx_sessions_last_modified' already exists.")
         else:
             logger.error("Could not establish database connection after multiple retries. Aborting initialization.")
 